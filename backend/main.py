@@ -3,12 +3,51 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 import os
-import json
-import subprocess
+import orjson
 import re
+import sqlite3
+import subprocess
+import asyncio
+import bisect
+import threading
+import pygit2
+from anyio import to_thread
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 
-app = FastAPI(title="CourseMap API")
+@asynccontextmanager
+async def lifespan(app):
+    global commits_waiting, commit_lock, push_queue
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    commits_waiting = asyncio.Event()
+    commit_lock = asyncio.Lock()
+    push_queue = asyncio.Queue(maxsize=1)
+    # Dirty courses and written paths were only tracked in memory before a
+    # restart, so re-export courses whose JSON is behind the database and
+    # stage whatever git still sees as changed
+    dirty_courses.update(stale_courses())
+    changed_paths.update(await to_thread.run_sync(uncommitted_paths))
+    if dirty_courses or changed_paths:
+        queue_commit("Sync content")
+    if pending_commits:
+        commits_waiting.set()
+    await rebuild_search_index()
+    workers = [asyncio.create_task(commit_worker()), asyncio.create_task(push_worker())]
+    yield
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    await flush_commits()
+    # Also push if one was in flight, git_push waits for it to finish first
+    if not push_queue.empty() or push_lock.locked():
+        try:
+            await to_thread.run_sync(git_push)
+        except Exception as e:
+            print(f"Push error: {e}")
+    commits_waiting = None
+
+app = FastAPI(title="CourseMap API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,74 +61,217 @@ app.add_middleware(
 REPO_PATH = "./coursemap-content"  # Git repo folder
 COURSES_DIR = f"{REPO_PATH}/courses"
 INDEX_FILE = f"{REPO_PATH}/index.json"
+DB_FILE = "./coursemap.db"  # Metadata store, exported to the JSON files above on commit
+COMMIT_DEBOUNCE = 0.5  # Seconds to collect changes before committing them together
+# Threads for blocking work (commit, push, atomic writes and note reads).
+# Handlers are all async def, so requests themselves don't take tokens.
+# Each idle thread costs memory, too few queues work behind slow pushes and fsyncs
+THREADPOOL_SIZE = 100
 
 # Initialize repo structure
 def init_repo():
     os.makedirs(COURSES_DIR, exist_ok=True)
     if not os.path.exists(INDEX_FILE):
-        with open(INDEX_FILE, 'w') as f:
-            json.dump({"courses": []}, f, indent=2)
+        with open(INDEX_FILE, 'wb') as f:
+            f.write(orjson.dumps({"courses": []}, option=orjson.OPT_INDENT_2))
 
     # Initialize git if not exists
     if not os.path.exists(f"{REPO_PATH}/.git"):
-        subprocess.run(["git", "init"], cwd=REPO_PATH)
-        subprocess.run(["git", "config", "user.name", "CourseMap"], cwd=REPO_PATH)
-        subprocess.run(["git", "config", "user.email", "coursemap@local"], cwd=REPO_PATH)
+        git_repo = pygit2.init_repository(REPO_PATH)
+        git_repo.config["user.name"] = "CourseMap"
+        git_repo.config["user.email"] = "coursemap@local"
+        return git_repo
+
+    return pygit2.Repository(REPO_PATH)
 
-init_repo()
+# Opened once and reused by every commit, instead of spawning git per call
+repo = init_repo()
 
 # Helpers
+SLUG_STRIP_RE = re.compile(r'[^\w\s-]')
+SLUG_DASH_RE = re.compile(r'[-\s]+')
+
+@lru_cache(maxsize=1024)
 def slugify(text):
     """Convert text to URL-safe slug"""
-    text = text.lower().strip()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[-\s]+', '-', text)
-    return text
+    return SLUG_DASH_RE.sub('-', SLUG_STRIP_RE.sub('', text.lower().strip()))
 
-def git_commit_push(message):
-    """Git add, commit, and push"""
+def git_signature():
+    """Commit signature from the repo config, falling back to the CourseMap identity"""
     try:
-        subprocess.run(["git", "add", "."], cwd=REPO_PATH, check=True)
-        subprocess.run(["git", "commit", "-m", message], cwd=REPO_PATH, check=True)
-        # Only push if remote exists
-        result = subprocess.run(["git", "remote"], cwd=REPO_PATH, capture_output=True, text=True)
-        if result.stdout.strip():
-            subprocess.run(["git", "push"], cwd=REPO_PATH, check=True)
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Git error: {e}")
+        return repo.default_signature
+    except (KeyError, pygit2.GitError):
+        return pygit2.Signature("CourseMap", "coursemap@local")
+
+def git_commit(message, paths):
+    """Stage the given repo-relative paths and commit (in-process via libgit2).
+    Returns False if there was nothing to commit, raises pygit2.GitError on failure"""
+    # Only the files we wrote, instead of scanning the whole working tree
+    index = repo.index
+    for path in paths:
+        if os.path.exists(f"{REPO_PATH}/{path}"):
+            index.add(path)
+        else:
+            index.remove(path)
+    index.write()
+    tree = index.write_tree()
+
+    parents = [] if repo.head_is_unborn else [repo.head.target]
+    if parents and repo[parents[0]].tree_id == tree:
+        # Nothing to commit
         return False
 
-def load_index():
-    with open(INDEX_FILE, 'r') as f:
-        return json.load(f)
-
-def save_index(data):
-    with open(INDEX_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
-
-def get_course_meta(course_slug):
-    """Load course metadata from course.json"""
-    meta_file = f"{COURSES_DIR}/{course_slug}/course.json"
-    if os.path.exists(meta_file):
-        with open(meta_file, 'r') as f:
-            return json.load(f)
-    return None
-
-def save_course_meta(course_slug, data):
-    """Save course metadata to course.json"""
-    course_dir = f"{COURSES_DIR}/{course_slug}"
-    os.makedirs(course_dir, exist_ok=True)
-    meta_file = f"{course_dir}/course.json"
-    with open(meta_file, 'w') as f:
-        json.dump(data, f, indent=2)
-
-def calculate_progress(course_slug):
-    """Calculate course progress based on completed topics"""
-    meta = get_course_meta(course_slug)
-    if not meta:
-        return 0
+    signature = git_signature()
+    repo.create_commit("HEAD", signature, signature, message, tree, parents)
+    return True
+
+def uncommitted_paths():
+    """Paths that differ from HEAD, e.g. written before a crash or a failed commit"""
+    return [
+        path for path, flags in repo.status().items()
+        # Skip temp files left behind by an interrupted atomic_write
+        if not flags & pygit2.enums.FileStatus.IGNORED and ".tmp." not in path
+    ]
+
+# A cancelled push keeps running in its thread, so pushes serialize on this
+push_lock = threading.Lock()
+
+def git_push():
+    """Push the current branch, if a remote exists"""
+    with push_lock:
+        # Own Repository handle: pushes run alongside commits in another thread
+        if len(pygit2.Repository(REPO_PATH).remotes) == 0:
+            return
+        # The git CLI for the network step, so the configured upstream,
+        # credential helpers and ssh config all apply. It runs off the
+        # request path, so the process spawn costs nothing per request
+        result = subprocess.run(["git", "push"], cwd=REPO_PATH, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Git push error: {result.stderr.strip()}")
+
+# Metadata database: courses, modules and topics live in SQLite, markdown
+# stays on disk. The JSON files are written from it when committing
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY,
+    code TEXT NOT NULL,
+    name TEXT NOT NULL,
+    slug TEXT NOT NULL UNIQUE,
+    progress INTEGER NOT NULL DEFAULT 0,
+    total_count INTEGER NOT NULL DEFAULT 0,
+    completed_count INTEGER NOT NULL DEFAULT 0,
+    next_module_id INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS modules (
+    course_id INTEGER NOT NULL REFERENCES courses(id),
+    id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    next_topic_id INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (course_id, id)
+);
+CREATE TABLE IF NOT EXISTS topics (
+    course_id INTEGER NOT NULL,
+    module_id INTEGER NOT NULL,
+    id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    file TEXT NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    priority TEXT NOT NULL,
+    time INTEGER NOT NULL,
+    locked INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (course_id, module_id, id),
+    FOREIGN KEY (course_id, module_id) REFERENCES modules(course_id, id)
+);
+CREATE TABLE IF NOT EXISTS sync (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    head TEXT  -- Content repo HEAD the database last matched
+);
+"""
 
+# Public fields only, the progress counters stay internal
+COURSE_COLUMNS = "id, code, name, slug, progress"
+MODULE_COLUMNS = "id, title, slug, completed"
+TOPIC_FIELDS = ("id", "title", "slug", "file", "completed", "priority", "time", "locked")
+TOPIC_COLUMNS = ", ".join(TOPIC_FIELDS)
+
+def repo_head():
+    """Oid of the content repo's HEAD, None before the first commit"""
+    return None if repo.head_is_unborn else str(repo.head.target)
+
+def record_head(conn, head):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO sync (id, head) VALUES (1, ?)", (head,))
+
+def init_db():
+    """Open the metadata database, importing the repo's JSON files when it is new
+    or the repo has moved on without it (e.g. a git pull from another device)"""
+    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+
+    synced = conn.execute("SELECT head FROM sync").fetchone()
+    head = repo_head()
+    if synced is None or synced["head"] != head:
+        import_json(conn)
+        record_head(conn, head)
+    return conn
+
+def reset_id_counters(conn):
+    """Point the next module/topic id counters past the highest existing ids"""
+    conn.execute(
+        "UPDATE courses SET next_module_id = 1 + (SELECT COALESCE(MAX(id), 0) FROM modules WHERE course_id = courses.id)"
+    )
+    conn.execute(
+        """UPDATE modules SET next_topic_id = 1 + (
+            SELECT COALESCE(MAX(id), 0) FROM topics WHERE course_id = modules.course_id AND module_id = modules.id
+        )"""
+    )
+
+def import_json(conn):
+    """Replace the database contents with index.json and every course.json"""
+    with open(INDEX_FILE, 'rb') as f:
+        index = orjson.loads(f.read())
+
+    with conn:
+        conn.execute("DELETE FROM topics")
+        conn.execute("DELETE FROM modules")
+        conn.execute("DELETE FROM courses")
+        for course_ref in index.get("courses", []):
+            meta_file = f"{COURSES_DIR}/{course_ref['slug']}/course.json"
+            if not os.path.exists(meta_file):
+                continue
+            with open(meta_file, 'rb') as f:
+                meta = orjson.loads(f.read())
+
+            total, completed = calculate_progress(meta)
+            conn.execute(
+                "INSERT INTO courses (id, code, name, slug, total_count, completed_count) VALUES (?, ?, ?, ?, ?, ?)",
+                (meta["id"], meta["code"], meta["name"], meta["slug"], total, completed)
+            )
+            update_counts(conn, meta["id"])
+            for module in meta.get("modules", []):
+                conn.execute(
+                    "INSERT INTO modules (course_id, id, title, slug, completed) VALUES (?, ?, ?, ?, ?)",
+                    (meta["id"], module["id"], module["title"], module.get("slug", slugify(module["title"])),
+                     module.get("completed", False))
+                )
+                for topic in module.get("topics", []):
+                    conn.execute(
+                        """INSERT INTO topics (course_id, module_id, id, title, slug, file, completed, priority, time, locked)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (meta["id"], module["id"], topic["id"], topic["title"], topic["slug"], topic["file"],
+                         topic.get("completed", False), topic.get("priority", "medium"), topic.get("time", 15),
+                         topic.get("locked", False))
+                    )
+        reset_id_counters(conn)
+
+def calculate_progress(meta):
+    """Count all topics and completed topics in course.json metadata"""
     total = 0
     completed = 0
     for module in meta.get("modules", []):
@@ -98,7 +280,271 @@ def calculate_progress(course_slug):
             if topic.get("completed", False):
                 completed += 1
 
-    return int((completed / total * 100) if total > 0 else 0)
+    return total, completed
+
+def update_counts(conn, course_id, total=0, completed=0):
+    """Adjust a course's topic counts and recompute its progress"""
+    conn.execute(
+        "UPDATE courses SET total_count = total_count + ?, completed_count = completed_count + ? WHERE id = ?",
+        (total, completed, course_id)
+    )
+    conn.execute(
+        """UPDATE courses SET progress = CASE WHEN total_count > 0 THEN completed_count * 100 / total_count ELSE 0 END
+        WHERE id = ?""",
+        (course_id,)
+    )
+
+db = init_db()
+
+# Commit batching: endpoints queue a message and return, the worker
+# commits everything queued within the debounce window as one commit
+pending_commits = []
+# Repo-relative paths written since the last commit
+changed_paths = set()
+commits_waiting = None
+commit_lock = None
+# Holds at most one "needs push" flag, so commits made during a push share the next one
+push_queue = None
+
+def queue_commit(message):
+    """Queue a change for the next batched git commit"""
+    pending_commits.append(message)
+    if commits_waiting is not None:
+        commits_waiting.set()
+
+def batch_message(messages):
+    """Join queued messages into one commit message"""
+    if len(messages) == 1:
+        return messages[0]
+    body = "\n".join(f"- {message}" for message in messages)
+    return f"Update content ({len(messages)} changes)\n\n{body}"
+
+async def flush_commits():
+    """Commit all queued changes as a single git commit"""
+    async with commit_lock:
+        if not pending_commits:
+            return False
+        # Messages stay queued until their commit is made, so a failed
+        # or cancelled flush is retried with them
+        messages = pending_commits[:]
+        commits_waiting.clear()
+        try:
+            await export_json()
+            paths = sorted(changed_paths)
+            changed_paths.clear()
+            try:
+                committed = await to_thread.run_sync(git_commit, batch_message(messages), paths)
+            except BaseException:
+                changed_paths.update(paths)
+                raise
+        except BaseException:
+            commits_waiting.set()
+            raise
+        # Changes queued while we were committing stay for the next batch
+        del pending_commits[:len(messages)]
+        if committed:
+            record_head(db, repo_head())
+
+    if committed and push_queue is not None and push_queue.empty():
+        push_queue.put_nowait(None)
+    return committed
+
+async def commit_worker():
+    """Background task that commits queued changes after a short debounce"""
+    while True:
+        await commits_waiting.wait()
+        await asyncio.sleep(COMMIT_DEBOUNCE)
+        try:
+            # Shielded so shutdown waits for this commit on the lock
+            # instead of starting another one beside its thread
+            await asyncio.shield(flush_commits())
+        except Exception as e:
+            # Messages stay queued, keep the worker alive to retry them
+            print(f"Commit error: {e}")
+
+async def push_worker():
+    """Background task that pushes new commits off the request path"""
+    while True:
+        await push_queue.get()
+        try:
+            await to_thread.run_sync(git_push)
+        except Exception as e:
+            # Keep the worker alive, the next commit queues another push
+            print(f"Push error: {e}")
+
+def atomic_write(path, data: bytes):
+    """Write to a temp file beside path and rename it into place, so readers never see a partial file"""
+    tmp = f"{path}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+async def write_json(path, data):
+    await to_thread.run_sync(atomic_write, path, orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    changed_paths.add(os.path.relpath(path, REPO_PATH))
+
+def read_file(path):
+    """Read a markdown file, empty if it doesn't exist"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return ""
+
+def read_files(paths):
+    """Read markdown files one at a time, so only one is ever open"""
+    return [read_file(path) for path in paths]
+
+async def read_text(path):
+    return await to_thread.run_sync(read_file, path)
+
+async def write_text(path, content):
+    await to_thread.run_sync(atomic_write, path, content.encode('utf-8'))
+    changed_paths.add(os.path.relpath(path, REPO_PATH))
+
+def module_dict(row):
+    return {**dict(row), "completed": bool(row["completed"]), "topics": []}
+
+def topic_dict(row):
+    topic = {field: row[field] for field in TOPIC_FIELDS}
+    return {**topic, "completed": bool(row["completed"]), "locked": bool(row["locked"])}
+
+def list_courses():
+    """Course summaries for the course list and index.json"""
+    return [dict(row) for row in db.execute(f"SELECT {COURSE_COLUMNS} FROM courses ORDER BY id")]
+
+def get_course_meta(course_id):
+    """Load a course with its modules and topics"""
+    course = db.execute(f"SELECT {COURSE_COLUMNS} FROM courses WHERE id = ?", (course_id,)).fetchone()
+    if not course:
+        return None
+
+    modules = {}
+    for row in db.execute(f"SELECT {MODULE_COLUMNS} FROM modules WHERE course_id = ? ORDER BY id", (course_id,)):
+        modules[row["id"]] = module_dict(row)
+    for row in db.execute(
+        f"SELECT module_id, {TOPIC_COLUMNS} FROM topics WHERE course_id = ? ORDER BY module_id, id", (course_id,)
+    ):
+        modules[row["module_id"]]["topics"].append(topic_dict(row))
+    return {**dict(course), "modules": list(modules.values())}
+
+# Courses whose course.json needs rewriting at the next commit
+dirty_courses = set()
+
+async def export_json():
+    """Write changed courses to course.json and refresh index.json so git tracks the metadata"""
+    if not dirty_courses:
+        return
+
+    # Take the set before awaiting, courses changed meanwhile stay dirty for the next export
+    course_ids = sorted(dirty_courses)
+    dirty_courses.clear()
+    try:
+        for course_id in course_ids:
+            meta = get_course_meta(course_id)
+            await write_json(f"{COURSES_DIR}/{meta['slug']}/course.json", meta)
+        await write_json(INDEX_FILE, {"courses": list_courses()})
+    except BaseException:
+        dirty_courses.update(course_ids)
+        raise
+
+def stale_courses():
+    """Ids of courses whose course.json is missing or differs from the database"""
+    stale = []
+    for course in list_courses():
+        try:
+            with open(f"{COURSES_DIR}/{course['slug']}/course.json", 'rb') as f:
+                exported = orjson.loads(f.read())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            exported = None
+        if exported != get_course_meta(course["id"]):
+            stale.append(course["id"])
+    return stale
+
+# Search index: token -> keys of the entries containing it. Keys are
+# (course_id, module_id, topic_id) with 0 for levels an entry doesn't have,
+# so sorted keys list a course, then its modules, then their topics
+TOKEN_RE = re.compile(r'\w+')
+SEARCH_INDEX: dict[str, set[tuple]] = {}
+_search_results: dict[tuple, dict] = {}
+_search_tokens: dict[tuple, set[str]] = {}
+# Sorted SEARCH_INDEX tokens for prefix lookups, emptied when tokens come
+# or go and rebuilt by the next search
+_search_vocab: list[str] = []
+
+def tokenize(text):
+    """Split text into the set of lowercase words used by the search index"""
+    # Lowercase the distinct words only, never a full copy of a long note
+    return {token.lower() for token in set(TOKEN_RE.findall(text))}
+
+def topic_tokens(title, content):
+    # Tokenize separately, joining them would copy the whole note
+    return tokenize(title) | tokenize(content)
+
+def index_entry(key, result, tokens):
+    """Add an entry to the search index, replacing its previous tokens"""
+    for token in _search_tokens.get(key, set()) - tokens:
+        postings = SEARCH_INDEX[token]
+        postings.discard(key)
+        if not postings:
+            del SEARCH_INDEX[token]
+            _search_vocab.clear()
+    for token in tokens:
+        if token not in SEARCH_INDEX:
+            SEARCH_INDEX[token] = set()
+            _search_vocab.clear()
+        SEARCH_INDEX[token].add(key)
+    _search_tokens[key] = tokens
+    _search_results[key] = result
+
+def index_course(meta):
+    index_entry((meta["id"], 0, 0), {
+        "type": "course",
+        "course_id": meta["id"],
+        "title": f"{meta['code']} - {meta['name']}"
+    }, tokenize(f"{meta['code']} {meta['name']}"))
+
+def index_module(meta, module):
+    index_entry((meta["id"], module["id"], 0), {
+        "type": "module",
+        "course_id": meta["id"],
+        "module_id": module["id"],
+        "title": f"{meta['code']} > {module['title']}"
+    }, tokenize(module["title"]))
+
+def index_topic(meta, module, topic, tokens):
+    index_entry((meta["id"], module["id"], topic["id"]), {
+        "type": "topic",
+        "course_id": meta["id"],
+        "module_id": module["id"],
+        "topic_id": topic["id"],
+        "title": f"{meta['code']} > {module['title']} > {topic['title']}"
+    }, tokens)
+
+async def rebuild_search_index():
+    """Index every course, module and topic (including markdown content)"""
+    SEARCH_INDEX.clear()
+    _search_results.clear()
+    _search_tokens.clear()
+    _search_vocab.clear()
+
+    courses = {row["id"]: row for row in db.execute("SELECT id, code, name, slug FROM courses")}
+    modules = {(row["course_id"], row["id"]): row for row in db.execute("SELECT course_id, id, title FROM modules")}
+    topics = db.execute("SELECT course_id, module_id, id, title, file FROM topics").fetchall()
+    # One thread reads them in turn: opening every note at once runs out of file descriptors
+    contents = await to_thread.run_sync(
+        read_files, [f"{COURSES_DIR}/{courses[t['course_id']]['slug']}/{t['file']}" for t in topics]
+    )
+
+    for course in courses.values():
+        index_course(course)
+    for (course_id, _), module in modules.items():
+        index_module(courses[course_id], module)
+    for topic, content in zip(topics, contents):
+        index_topic(courses[topic["course_id"]], modules[(topic["course_id"], topic["module_id"])], topic,
+                    topic_tokens(topic["title"], content))
 
 # Models
 class CourseCreate(BaseModel):
@@ -120,26 +566,16 @@ class TopicUpdate(BaseModel):
 # Routes
 
 @app.get("/")
-def root():
+async def root():
     return {"status": "CourseMap API (Git-backed)", "repo": REPO_PATH}
 
 @app.get("/courses")
-def get_courses():
-    """List all courses from index.json"""
-    index = load_index()
-    courses = []
-
-    for course_ref in index.get("courses", []):
-        course_slug = course_ref["slug"]
-        meta = get_course_meta(course_slug)
-        if meta:
-            meta["progress"] = calculate_progress(course_slug)
-            courses.append(meta)
-
-    return courses
+async def get_courses():
+    """List all courses"""
+    return list_courses()
 
 @app.post("/courses")
-def create_course(course: CourseCreate):
+async def create_course(course: CourseCreate):
     """Create new course"""
     course_slug = slugify(f"{course.code}-{course.name}")
     course_dir = f"{COURSES_DIR}/{course_slug}"
@@ -150,57 +586,49 @@ def create_course(course: CourseCreate):
     os.makedirs(course_dir, exist_ok=True)
 
     # Create course metadata
-    course_id = len(load_index().get("courses", [])) + 1
-    meta = {
-        "id": course_id,
-        "code": course.code,
-        "name": course.name,
-        "slug": course_slug,
-        "progress": 0,
-        "modules": []
-    }
-    save_course_meta(course_slug, meta)
-
-    # Update index
-    index = load_index()
-    index["courses"].append({"id": course_id, "slug": course_slug})
-    save_index(index)
+    with db:
+        cursor = db.execute(
+            "INSERT INTO courses (code, name, slug) VALUES (?, ?, ?)", (course.code, course.name, course_slug)
+        )
+    meta = get_course_meta(cursor.lastrowid)
+    index_course(meta)
+    dirty_courses.add(meta["id"])
 
     # Git commit
-    git_commit_push(f"Create course: {course.code} - {course.name}")
+    queue_commit(f"Create course: {course.code} - {course.name}")
 
     return meta
 
 @app.get("/courses/{course_id}")
-def get_course(course_id: int):
+async def get_course(course_id: int):
     """Get course by ID"""
-    index = load_index()
-    course_ref = next((c for c in index["courses"] if c["id"] == course_id), None)
-    if not course_ref:
-        raise HTTPException(status_code=404, detail="Course not found")
-
-    meta = get_course_meta(course_ref["slug"])
+    meta = get_course_meta(course_id)
     if not meta:
-        raise HTTPException(status_code=404, detail="Course metadata not found")
+        raise HTTPException(status_code=404, detail="Course not found")
 
-    meta["progress"] = calculate_progress(course_ref["slug"])
     return meta
 
 @app.post("/courses/{course_id}/modules")
-def create_module(course_id: int, module: ModuleCreate):
+async def create_module(course_id: int, module: ModuleCreate):
     """Create new module in course"""
-    index = load_index()
-    course_ref = next((c for c in index["courses"] if c["id"] == course_id), None)
-    if not course_ref:
+    course = db.execute("SELECT id, code, slug FROM courses WHERE id = ?", (course_id,)).fetchone()
+    if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    meta = get_course_meta(course_ref["slug"])
     module_slug = slugify(module.title)
-    module_dir = f"{COURSES_DIR}/{course_ref['slug']}/{module_slug}"
+    module_dir = f"{COURSES_DIR}/{course['slug']}/{module_slug}"
     os.makedirs(module_dir, exist_ok=True)
 
     # Add module to metadata
-    module_id = len(meta.get("modules", [])) + 1
+    with db:
+        module_id = db.execute(
+            "UPDATE courses SET next_module_id = next_module_id + 1 WHERE id = ? RETURNING next_module_id - 1",
+            (course_id,)
+        ).fetchone()[0]
+        db.execute(
+            "INSERT INTO modules (course_id, id, title, slug) VALUES (?, ?, ?, ?)",
+            (course_id, module_id, module.title, module_slug)
+        )
     new_module = {
         "id": module_id,
         "title": module.title,
@@ -208,29 +636,29 @@ def create_module(course_id: int, module: ModuleCreate):
         "completed": False,
         "topics": []
     }
-    meta["modules"].append(new_module)
-    save_course_meta(course_ref["slug"], meta)
+    index_module(course, new_module)
+    dirty_courses.add(course_id)
 
-    git_commit_push(f"Add module: {module.title}")
+    queue_commit(f"Add module: {module.title}")
 
     return new_module
 
 @app.post("/courses/{course_id}/modules/{module_id}/topics")
-def create_topic(course_id: int, module_id: int, topic: TopicCreate):
+async def create_topic(course_id: int, module_id: int, topic: TopicCreate):
     """Create new topic in module"""
-    index = load_index()
-    course_ref = next((c for c in index["courses"] if c["id"] == course_id), None)
-    if not course_ref:
+    course = db.execute("SELECT id, code, slug FROM courses WHERE id = ?", (course_id,)).fetchone()
+    if not course:
         raise HTTPException(status_code=404, detail="Course not found")
 
-    meta = get_course_meta(course_ref["slug"])
-    module = next((m for m in meta["modules"] if m["id"] == module_id), None)
+    module = db.execute(
+        "SELECT id, title, slug FROM modules WHERE course_id = ? AND id = ?", (course_id, module_id)
+    ).fetchone()
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
 
     # Create markdown file
     topic_slug = slugify(topic.title)
-    topic_file = f"{COURSES_DIR}/{course_ref['slug']}/{module['slug']}/{topic_slug}.md"
+    topic_file = f"{COURSES_DIR}/{course['slug']}/{module['slug']}/{topic_slug}.md"
 
     # Initialize with template
     template = f"""# {topic.title}
@@ -245,13 +673,10 @@ Write your content here...
 ## Practice Problems
 """
 
-    with open(topic_file, 'w') as f:
-        f.write(template)
+    await write_text(topic_file, template)
 
     # Add topic to metadata
-    topic_id = len(module.get("topics", [])) + 1
     new_topic = {
-        "id": topic_id,
         "title": topic.title,
         "slug": topic_slug,
         "file": f"{module['slug']}/{topic_slug}.md",
@@ -260,126 +685,126 @@ Write your content here...
         "time": topic.time,
         "locked": False
     }
-    module["topics"].append(new_topic)
-    save_course_meta(course_ref["slug"], meta)
-
-    git_commit_push(f"Add topic: {topic.title}")
+    with db:
+        topic_id = db.execute(
+            """UPDATE modules SET next_topic_id = next_topic_id + 1 WHERE course_id = ? AND id = ?
+            RETURNING next_topic_id - 1""",
+            (course_id, module_id)
+        ).fetchone()[0]
+        db.execute(
+            """INSERT INTO topics (course_id, module_id, id, title, slug, file, priority, time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (course_id, module_id, topic_id, topic.title, topic_slug, new_topic["file"], topic.priority, topic.time)
+        )
+        update_counts(db, course_id, total=1)
+    new_topic = {"id": topic_id, **new_topic}
+    index_topic(course, module, new_topic, topic_tokens(topic.title, template))
+    dirty_courses.add(course_id)
+
+    queue_commit(f"Add topic: {topic.title}")
 
     return new_topic
 
-@app.get("/courses/{course_id}/modules/{module_id}/topics/{topic_id}")
-def get_topic(course_id: int, module_id: int, topic_id: int):
-    """Get topic with content from markdown file"""
-    index = load_index()
-    course_ref = next((c for c in index["courses"] if c["id"] == course_id), None)
-    if not course_ref:
-        raise HTTPException(status_code=404, detail="Course not found")
+def get_topic_rows(course_id, module_id, topic_id):
+    """Look up a topic with its course and module, raising 404 for whichever is missing"""
+    topic_columns = ", ".join(f"t.{field}" for field in TOPIC_FIELDS)
+    row = db.execute(
+        f"""SELECT c.code, c.slug AS course_slug, m.title AS module_title, m.slug AS module_slug, {topic_columns}
+        FROM topics t
+        JOIN modules m ON m.course_id = t.course_id AND m.id = t.module_id
+        JOIN courses c ON c.id = t.course_id
+        WHERE t.course_id = ? AND t.module_id = ? AND t.id = ?""",
+        (course_id, module_id, topic_id)
+    ).fetchone()
+
+    if not row:
+        # Work out which level is missing
+        if not db.execute("SELECT 1 FROM courses WHERE id = ?", (course_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Course not found")
+        if not db.execute("SELECT 1 FROM modules WHERE course_id = ? AND id = ?", (course_id, module_id)).fetchone():
+            raise HTTPException(status_code=404, detail="Module not found")
+        raise HTTPException(status_code=404, detail="Topic not found")
 
-    meta = get_course_meta(course_ref["slug"])
-    module = next((m for m in meta["modules"] if m["id"] == module_id), None)
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
+    course = {"id": course_id, "code": row["code"], "slug": row["course_slug"]}
+    module = {"id": module_id, "title": row["module_title"], "slug": row["module_slug"]}
+    return course, module, topic_dict(row)
 
-    topic = next((t for t in module["topics"] if t["id"] == topic_id), None)
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
+@app.get("/courses/{course_id}/modules/{module_id}/topics/{topic_id}")
+async def get_topic(course_id: int, module_id: int, topic_id: int):
+    """Get topic with content from markdown file"""
+    course, module, topic = get_topic_rows(course_id, module_id, topic_id)
 
     # Read markdown file
-    topic_file = f"{COURSES_DIR}/{course_ref['slug']}/{topic['file']}"
-    content = ""
-    if os.path.exists(topic_file):
-        with open(topic_file, 'r') as f:
-            content = f.read()
+    topic_file = f"{COURSES_DIR}/{course['slug']}/{topic['file']}"
+    content = await read_text(topic_file)
 
     return {**topic, "content": content}
 
 @app.patch("/courses/{course_id}/modules/{module_id}/topics/{topic_id}")
-def update_topic(course_id: int, module_id: int, topic_id: int, updates: TopicUpdate):
+async def update_topic(course_id: int, module_id: int, topic_id: int, updates: TopicUpdate):
     """Update topic content or completion status"""
-    index = load_index()
-    course_ref = next((c for c in index["courses"] if c["id"] == course_id), None)
-    if not course_ref:
-        raise HTTPException(status_code=404, detail="Course not found")
-
-    meta = get_course_meta(course_ref["slug"])
-    module = next((m for m in meta["modules"] if m["id"] == module_id), None)
-    if not module:
-        raise HTTPException(status_code=404, detail="Module not found")
-
-    topic = next((t for t in module["topics"] if t["id"] == topic_id), None)
-    if not topic:
-        raise HTTPException(status_code=404, detail="Topic not found")
+    course, module, topic = get_topic_rows(course_id, module_id, topic_id)
+    topic_file = f"{COURSES_DIR}/{course['slug']}/{topic['file']}"
+    content = updates.content
+    changes = []
 
     # Update content if provided
-    if updates.content is not None:
-        topic_file = f"{COURSES_DIR}/{course_ref['slug']}/{topic['file']}"
-        with open(topic_file, 'w') as f:
-            f.write(updates.content)
-        git_commit_push(f"Update topic: {topic['title']}")
+    if content is not None:
+        await write_text(topic_file, content)
+        index_topic(course, module, topic, topic_tokens(topic["title"], content))
+        changes.append(f"Update topic: {topic['title']}")
 
-    # Update completion status
+    # Update completion status, only when it actually flips. Decided by the
+    # UPDATE itself: the topic row above may be stale after the awaits
     if updates.completed is not None:
+        with db:
+            cursor = db.execute(
+                "UPDATE topics SET completed = ? WHERE course_id = ? AND module_id = ? AND id = ? AND completed != ?",
+                (updates.completed, course_id, module_id, topic_id, updates.completed)
+            )
+            if cursor.rowcount == 1:
+                update_counts(db, course_id, completed=1 if updates.completed else -1)
         topic["completed"] = updates.completed
-        save_course_meta(course_ref["slug"], meta)
-        git_commit_push(f"Mark {'complete' if updates.completed else 'incomplete'}: {topic['title']}")
+        if cursor.rowcount == 1:
+            dirty_courses.add(course_id)
+            changes.append(f"Mark {'complete' if updates.completed else 'incomplete'}: {topic['title']}")
 
-    # Read current content
-    topic_file = f"{COURSES_DIR}/{course_ref['slug']}/{topic['file']}"
-    content = ""
-    if os.path.exists(topic_file):
-        with open(topic_file, 'r') as f:
-            content = f.read()
+    # One commit for the whole request, none if nothing changed
+    if changes:
+        queue_commit("; ".join(changes))
+
+    # Read current content, unless it was just written
+    if content is None:
+        content = await read_text(topic_file)
 
     return {**topic, "content": content}
 
+@app.post("/flush")
+async def flush():
+    """Commit queued changes immediately"""
+    return {"committed": await flush_commits()}
+
 @app.get("/search")
-def search(q: str):
+async def search(q: str):
     """Search across all content"""
-    results = []
-    q_lower = q.lower()
-
-    index = load_index()
-    for course_ref in index.get("courses", []):
-        meta = get_course_meta(course_ref["slug"])
-        if not meta:
-            continue
-
-        # Search in course
-        if q_lower in meta["code"].lower() or q_lower in meta["name"].lower():
-            results.append({
-                "type": "course",
-                "course_id": meta["id"],
-                "title": f"{meta['code']} - {meta['name']}"
-            })
-
-        # Search in modules and topics
-        for module in meta.get("modules", []):
-            if q_lower in module["title"].lower():
-                results.append({
-                    "type": "module",
-                    "course_id": meta["id"],
-                    "module_id": module["id"],
-                    "title": f"{meta['code']} > {module['title']}"
-                })
-
-            for topic in module.get("topics", []):
-                if q_lower in topic["title"].lower():
-                    # Also search in file content
-                    topic_file = f"{COURSES_DIR}/{course_ref['slug']}/{topic['file']}"
-                    if os.path.exists(topic_file):
-                        with open(topic_file, 'r') as f:
-                            content = f.read()
-                            if q_lower in content.lower():
-                                results.append({
-                                    "type": "topic",
-                                    "course_id": meta["id"],
-                                    "module_id": module["id"],
-                                    "topic_id": topic["id"],
-                                    "title": f"{meta['code']} > {module['title']} > {topic['title']}"
-                                })
-
-    return results[:20]
+    words = TOKEN_RE.findall(q.lower())
+    if not words:
+        return []
+
+    # Earlier words must match exactly, the last one may still be being typed
+    *exact, prefix = words
+    if not _search_vocab:
+        _search_vocab.extend(sorted(SEARCH_INDEX))
+    prefix_matches = set()
+    for i in range(bisect.bisect_left(_search_vocab, prefix), len(_search_vocab)):
+        if not _search_vocab[i].startswith(prefix):
+            break
+        prefix_matches |= SEARCH_INDEX[_search_vocab[i]]
+
+    postings = sorted([prefix_matches, *(SEARCH_INDEX.get(token, set()) for token in set(exact))], key=len)
+    matches = set.intersection(*postings)
+    return [_search_results[key] for key in sorted(matches)[:20]]
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=8000, access_log=False)
@@ -0,0 +1,186 @@
+import asyncio
+import importlib.util
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+MAIN = Path(__file__).resolve().parent.parent / "main.py"
+
+
+def load_main():
+    """Import main fresh, so it sets up its repo and database in the current directory"""
+    spec = importlib.util.spec_from_file_location("main", MAIN)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["main"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def topic(topic_id, title, completed=False):
+    slug = title.lower().replace(" ", "-")
+    return {"id": topic_id, "title": title, "slug": slug, "file": f"basics/{slug}.md", "completed": completed}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def legacy_content(workdir):
+    """Content written by the JSON-only version, before the SQLite store existed"""
+    course_dir = workdir / "coursemap-content" / "courses" / "cs021-computer-science"
+    (course_dir / "basics").mkdir(parents=True)
+    (workdir / "coursemap-content" / "index.json").write_text(json.dumps(
+        {"courses": [{"id": 1, "code": "CS021", "name": "Computer Science", "slug": "cs021-computer-science"}]}
+    ))
+    (course_dir / "course.json").write_text(json.dumps({
+        "id": 1, "code": "CS021", "name": "Computer Science", "slug": "cs021-computer-science", "progress": 0,
+        "modules": [{
+            "id": 1, "title": "Basics", "slug": "basics", "completed": False,
+            "topics": [topic(1, "Variables", completed=True), topic(2, "Loops"), topic(3, "Recursion")],
+        }],
+    }))
+    (course_dir / "basics" / "variables.md").write_text("# Variables\n\nNames for values, e.g. café = 1\n",
+                                                        encoding="utf-8")
+    return workdir
+
+
+def test_import_legacy_json(legacy_content):
+    main = load_main()
+    with TestClient(main.app) as client:
+        course = client.get("/courses/1").json()
+        assert course["progress"] == 33
+        assert [t["title"] for t in course["modules"][0]["topics"]] == ["Variables", "Loops", "Recursion"]
+        assert client.get("/search", params={"q": "café"}).json()[0]["topic_id"] == 1
+
+        # Counters carry on after the imported ids
+        module = client.post("/courses/1/modules", json={"title": "Advanced"}).json()
+        new_topic = client.post("/courses/1/modules/1/topics", json={"title": "Sorting"}).json()
+        assert (module["id"], new_topic["id"]) == (2, 4)
+        assert client.get("/courses/1").json()["progress"] == 25
+
+
+def test_course_fields_are_public_only(workdir):
+    main = load_main()
+    with TestClient(main.app) as client:
+        created = client.post("/courses", json={"code": "MA101", "name": "Calculus"}).json()
+        fetched = client.get("/courses/1").json()
+        assert client.post("/flush").json() == {"committed": True}
+
+    exported = json.loads((workdir / "coursemap-content" / "courses" / "ma101-calculus" / "course.json").read_text())
+    for course in (created, fetched, exported):
+        assert set(course) == {"id", "code", "name", "slug", "progress", "modules"}
+
+
+def test_update_topic_progress(workdir):
+    main = load_main()
+    with TestClient(main.app) as client:
+        client.post("/courses", json={"code": "CS021", "name": "Computer Science"})
+        client.post("/courses/1/modules", json={"title": "Basics"})
+        for title in ("Variables", "Loops"):
+            client.post("/courses/1/modules/1/topics", json={"title": title})
+
+        url = "/courses/1/modules/1/topics/1"
+        client.patch(url, json={"completed": True})
+        assert client.get("/courses/1").json()["progress"] == 50
+        # Completing it again doesn't count it twice
+        client.patch(url, json={"completed": True})
+        assert client.get("/courses/1").json()["progress"] == 50
+        client.patch(url, json={"completed": False})
+        assert client.get("/courses/1").json()["progress"] == 0
+
+
+def test_concurrent_updates_count_once(workdir):
+    main = load_main()
+
+    async def run():
+        await main.create_course(main.CourseCreate(code="CS021", name="Computer Science"))
+        await main.create_module(1, main.ModuleCreate(title="Basics"))
+        for title in ("Variables", "Loops"):
+            await main.create_topic(1, 1, main.TopicCreate(title=title))
+        update = main.TopicUpdate(content="Done", completed=True)
+        await asyncio.gather(*(main.update_topic(1, 1, 1, update) for _ in range(3)))
+
+    asyncio.run(run())
+    assert main.get_course_meta(1)["progress"] == 50
+
+
+def test_restart_keeps_metadata_committed_outside_the_app(workdir):
+    main = load_main()
+    with TestClient(main.app) as client:
+        client.post("/courses", json={"code": "MA101", "name": "Calculus"})
+        client.post("/flush")
+
+    # A rename pulled in from another device
+    content = workdir / "coursemap-content"
+    meta_file = content / "courses" / "ma101-calculus" / "course.json"
+    meta = json.loads(meta_file.read_text())
+    meta_file.write_text(json.dumps({**meta, "name": "Calculus I"}))
+    subprocess.run(["git", "commit", "-qam", "Rename course"], cwd=content, check=True)
+
+    main = load_main()
+    with TestClient(main.app) as client:
+        assert client.get("/courses/1").json()["name"] == "Calculus I"
+        assert client.post("/flush").json() == {"committed": False}
+    assert json.loads(meta_file.read_text())["name"] == "Calculus I"
+
+
+def test_restart_reexports_missing_course_json(workdir):
+    main = load_main()
+    with TestClient(main.app) as client:
+        client.post("/courses", json={"code": "MA101", "name": "Calculus"})
+        client.post("/flush")
+
+    meta_file = workdir / "coursemap-content" / "courses" / "ma101-calculus" / "course.json"
+    meta_file.unlink()
+
+    main = load_main()
+    with TestClient(main.app) as client:
+        client.post("/flush")
+    assert json.loads(meta_file.read_text())["name"] == "Calculus"
+
+
+@pytest.fixture
+def search_client(legacy_content):
+    main = load_main()
+    with TestClient(main.app) as client:
+        yield client
+
+
+def search_titles(client, q):
+    return [result["title"] for result in client.get("/search", params={"q": q}).json()]
+
+
+def test_search_matches_last_word_as_prefix(search_client):
+    assert search_titles(search_client, "var") == ["CS021 > Basics > Variables"]
+    assert search_titles(search_client, "VARIABLES") == ["CS021 > Basics > Variables"]
+    # Only the last word may be partial
+    assert search_titles(search_client, "var values") == []
+
+
+def test_search_intersects_words(search_client):
+    assert search_titles(search_client, "names values") == ["CS021 > Basics > Variables"]
+    assert search_titles(search_client, "variables loops") == []
+    assert search_titles(search_client, "computer sci") == ["CS021 - Computer Science"]
+
+
+def test_search_follows_content_updates(search_client):
+    search_client.patch("/courses/1/modules/1/topics/2", json={"content": "# Loops\n\nfor and while"})
+    assert search_titles(search_client, "while") == ["CS021 > Basics > Loops"]
+
+    search_client.patch("/courses/1/modules/1/topics/2", json={"content": "# Loops\n\nIteration"})
+    assert search_titles(search_client, "while") == []
+    assert search_titles(search_client, "iter") == ["CS021 > Basics > Loops"]
+    # The title still matches without being in the content
+    search_client.patch("/courses/1/modules/1/topics/2", json={"content": ""})
+    assert search_titles(search_client, "loops") == ["CS021 > Basics > Loops"]
+
+
+def test_search_punctuation_only(search_client):
+    assert search_client.get("/search", params={"q": "?! -"}).json() == []